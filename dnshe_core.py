@@ -0,0 +1,450 @@
+# -*- coding: utf-8 -*-
+"""
+DNSHE 免费域名自动续期核心逻辑（多账号，增强错误反馈）
+支持将续期结果写入 GitHub Step Summary，入口脚本见 renew.py
+"""
+
+import os
+import json
+import sys
+import time
+import hashlib
+import tempfile
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# 优先使用 orjson（C 实现，解析更快），未安装时回退到标准库
+try:
+    from orjson import loads as _loads
+except ImportError:
+    from json import loads as _loads
+
+# 当前线程正在处理的账号编号，用于给日志加上 [账号 N] 前缀
+_CURRENT_ACCOUNT = contextvars.ContextVar("current_account", default=None)
+
+class _AccountLogAdapter(logging.LoggerAdapter):
+    """在日志前标注所属账号，便于区分并发处理时交错输出的日志"""
+
+    def process(self, msg, kwargs):
+        account = _CURRENT_ACCOUNT.get()
+        if account is not None:
+            msg = f"[账号 {account}] {msg}"
+        return msg, kwargs
+
+log = _AccountLogAdapter(logging.getLogger(), {}).info
+
+API_BASE = "https://api005.dnshe.com/index.php?m=domain_hub"
+# 单个账号内同时进行的续期请求数
+RENEW_CONCURRENCY = 10
+# 同时处理的账号数
+ACCOUNT_CONCURRENCY = 8
+# 续期窗口：到期前多少天内才允许续期
+RENEW_WINDOW_DAYS = 180
+# 本地缓存目录与子域名列表缓存有效期（秒）；有效期由 CACHE_TTL 环境变量覆盖，
+# CACHE_TTL<=0 时完全不读写磁盘缓存（包括下方的批量续期探测结果）
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "dnshe")
+DEFAULT_CACHE_TTL = 300
+# 批量续期接口明确不可用（HTTP 400/404）时记录在缓存目录中，有效期内不再探测
+BULK_PROBE_TTL = 7 * 24 * 3600
+
+class _SafeRetry(Retry):
+    """续期等 POST 请求不是幂等的，只在 429/503（服务端未处理该请求）时按状态码重试"""
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method.upper() == "POST" and status_code not in (429, 503):
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+# 全局复用同一个 Session，避免每次请求都重新建立 TCP/TLS 连接；
+# 429/5xx 在连接层按指数退避自动重试（429 会遵循 Retry-After）
+SESSION = requests.Session()
+SESSION.headers.update({"Content-Type": "application/json"})
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=20,
+    # 并发线程多于连接池容量时排队等待空闲连接，而不是临时新建再丢弃
+    # （每个新连接都要重新做一次 DNS 解析和 TLS 握手）
+    pool_block=True,
+    max_retries=_SafeRetry(
+        total=3,
+        read=False,  # 请求已发出但读取响应失败时服务端可能已处理，不重试并直接抛出原异常
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET", "POST"],
+        raise_on_status=False,  # 重试耗尽后返回最后一次响应，交由下方统一处理错误信息
+    )
+))
+
+def _read_cache_ttl():
+    """读取 CACHE_TTL 环境变量，格式错误时回退到默认值（需在日志配置完成后调用）"""
+    value = os.getenv("CACHE_TTL")
+    if value is None:
+        return DEFAULT_CACHE_TTL
+    try:
+        return int(value)
+    except ValueError:
+        log(f"CACHE_TTL 不是有效整数（{value!r}），使用默认值 {DEFAULT_CACHE_TTL} 秒")
+        return DEFAULT_CACHE_TTL
+
+def _cache_key(api_key):
+    """由 API Key 生成缓存文件名，避免明文落盘"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+def _cache_get(key, ttl):
+    """读取未过期的缓存，缺失、过期或损坏时返回 None"""
+    if ttl <= 0:
+        return None
+    path = os.path.join(CACHE_DIR, f"{key}.json")
+    try:
+        if time.time() - os.path.getmtime(path) > ttl:
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _cache_put(key, data):
+    """原子写入缓存（先写临时文件再替换），失败时仅记录日志并清理临时文件"""
+    tmp_path = None
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(CACHE_DIR, f"{key}.json"))
+    except (OSError, TypeError, ValueError) as e:
+        log(f"写入缓存失败: {e}")
+        if tmp_path:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+def _cache_clear(key):
+    """删除缓存条目"""
+    try:
+        os.remove(os.path.join(CACHE_DIR, f"{key}.json"))
+    except OSError:
+        pass
+
+def _parse_expiry(value):
+    """解析子域名到期时间，统一为 UTC 时间；无法识别时返回 None"""
+    if not value:
+        return None
+    try:
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value, tz=timezone.utc)
+        text = str(value).strip()
+        # Python 3.11 之前的 fromisoformat 不识别结尾的 Z，统一换成 +00:00
+        if text[-1:] in ("Z", "z"):
+            text = text[:-1] + "+00:00"
+        expires = datetime.fromisoformat(text)
+    except (ValueError, OverflowError, OSError):
+        return None
+    if expires.tzinfo is None:
+        expires = expires.replace(tzinfo=timezone.utc)
+    return expires
+
+def call_api(endpoint, action, method="GET", headers=None, data=None):
+    """通用 API 调用函数，返回解析后的 JSON 或错误信息
+
+    headers 为账号认证头（X-API-Key / X-API-Secret），Content-Type 由 SESSION 统一提供
+    """
+    url = f"{API_BASE}&endpoint={endpoint}&action={action}"
+
+    log(f"请求 {method} {url}")
+    try:
+        if method.upper() == "GET":
+            resp = SESSION.get(url, headers=headers, timeout=30)
+        else:
+            resp = SESSION.post(url, headers=headers, json=data, timeout=30)
+
+        # 尝试解析 JSON
+        try:
+            result = _loads(resp.content)
+        except ValueError:
+            # 不是 JSON，可能是 HTML 或其他文本
+            content_type = resp.headers.get('Content-Type', '')
+            if 'text/html' in content_type:
+                return {
+                    "success": False,
+                    "error": f"服务器返回 HTML 页面 (HTTP {resp.status_code})，可能权限不足或需要登录",
+                    "http_status": resp.status_code
+                }
+            else:
+                return {
+                    "success": False,
+                    "error": f"服务器返回非 JSON 响应 (HTTP {resp.status_code})",
+                    "http_status": resp.status_code
+                }
+
+        # HTTP 状态码检查
+        if resp.status_code != 200:
+            get = result.get
+            error_msg = get('message') or get('error') or f"HTTP {resp.status_code}"
+            # 附加常见状态码说明
+            if resp.status_code == 403:
+                error_msg += f"（域名尚未进入续期窗口，需到期前{RENEW_WINDOW_DAYS}天内续期）"
+            elif resp.status_code == 401:
+                error_msg += "（认证失败，请检查 API Key/Secret）"
+            return {"success": False, "error": error_msg, "http_status": resp.status_code}
+
+        return result
+
+    except requests.exceptions.Timeout:
+        return {"success": False, "error": "请求超时"}
+    except requests.exceptions.ConnectionError:
+        return {"success": False, "error": "网络连接失败"}
+    except Exception as e:
+        return {"success": False, "error": f"请求异常: {str(e)}"}
+
+def renew_subdomain(auth_headers, subdomain_id, full_domain):
+    """续期单个子域名，返回状态和消息"""
+    log(f"尝试续期 {full_domain} (ID: {subdomain_id})")
+    result = call_api(
+        endpoint="subdomains",
+        action="renew",
+        method="POST",
+        headers=auth_headers,
+        data={"subdomain_id": subdomain_id}
+    )
+
+    return _renew_outcome(result, full_domain)
+
+def _renew_outcome(result, full_domain):
+    """将单个子域名的续期响应转换为状态和消息"""
+    get = result.get
+    if get("success"):
+        new_expires = get("new_expires_at", "未知")
+        log(f"✅ {full_domain} 续期成功，新到期时间: {new_expires}")
+        return {
+            "status": "success",
+            "message": f"续期成功，新到期时间 {new_expires}"
+        }
+    else:
+        error_msg = get("message") or get("error") or "未知错误"
+        # 如果返回了 HTTP 状态码，附加友好说明（已在 call_api 中处理，这里直接取 error_msg）
+        log(f"❌ {full_domain} 续期失败: {error_msg}")
+        return {
+            "status": "failed",
+            "message": error_msg
+        }
+
+def bulk_renew(auth_headers, targets, cache_key=None):
+    """批量续期账号下的子域名，一次请求完成
+
+    targets 为 (subdomain_id, full_domain) 列表。只要响应带有逐项 results 列表就按其结果返回
+    （即使整体 success 为 false，部分域名也可能已续期，不能再逐个重试）；
+    没有 results 列表时返回 None，由调用方回退到逐个续期。
+    cache_key 为 None（缓存已关闭）时不记录“接口不支持”的探测结果
+    """
+    log(f"尝试批量续期 {len(targets)} 个子域名")
+    result = call_api(
+        endpoint="subdomains",
+        action="renew_batch",
+        method="POST",
+        headers=auth_headers,
+        data={"subdomain_ids": [sub_id for sub_id, _ in targets]}
+    )
+    get = result.get
+    items = get("results")
+    if not isinstance(items, list):
+        error_msg = get("message") or get("error") or "响应格式无法识别"
+        log(f"批量续期不可用，改为逐个续期: {error_msg}")
+        if cache_key and get("http_status") in (400, 404):
+            _cache_put(f"{cache_key}.bulk", {"supported": False})
+        return None
+
+    by_id = {str(item.get("subdomain_id")): item for item in items if isinstance(item, dict)}
+    missing = {"success": False, "error": "批量续期未返回该域名结果"}
+    return [
+        _renew_outcome(by_id.get(str(sub_id), missing), full_domain)
+        for sub_id, full_domain in targets
+    ]
+
+def process_account(account, cache_ttl=DEFAULT_CACHE_TTL):
+    """处理单个账号：列出所有子域名并尝试续期
+
+    cache_ttl 为子域名列表缓存有效期（秒），<=0 时不读写任何磁盘缓存
+    """
+    api_key = account.get("key")
+    api_secret = account.get("secret")
+    if not api_key or not api_secret:
+        log("账号缺少 key 或 secret，跳过")
+        return None
+    auth_headers = {"X-API-Key": api_key, "X-API-Secret": api_secret}
+
+    # 获取子域名列表（优先使用未过期的本地缓存）
+    cache_key = _cache_key(api_key)
+    use_cache = cache_ttl > 0
+    list_res = _cache_get(cache_key, cache_ttl)
+    if list_res is not None:
+        log("使用缓存的子域名列表")
+    else:
+        list_res = call_api(
+            endpoint="subdomains",
+            action="list",
+            method="GET",
+            headers=auth_headers
+        )
+        if not list_res.get("success"):
+            error_msg = list_res.get("message") or list_res.get("error") or "列表获取失败"
+            log(f"获取子域名列表失败: {error_msg}")
+            return {"error": error_msg}
+        if use_cache:
+            _cache_put(cache_key, list_res)
+
+    subdomains = list_res.get("subdomains", [])
+    if not subdomains:
+        log("该账号下没有子域名")
+        return {"message": "无子域名"}
+
+    # 根据列表中的到期时间跳过尚未进入续期窗口的子域名，到期时间未知的仍尝试续期
+    threshold = datetime.now(timezone.utc) + timedelta(days=RENEW_WINDOW_DAYS)
+    targets = []
+    skipped = []
+    for sub in subdomains:
+        get = sub.get
+        sub_id = get("id")
+        if not sub_id:
+            continue
+        full_domain = get("full_domain") or f"{get('subdomain')}.{get('rootdomain')}"
+        expires = _parse_expiry(get("expires_at"))
+        if expires is not None and expires > threshold:
+            skipped.append({
+                "domain": full_domain,
+                "result": {"status": "skipped", "message": f"未进入续期窗口，到期时间 {get('expires_at')}"}
+            })
+            continue
+        targets.append((sub_id, full_domain))
+    if skipped:
+        log(f"跳过 {len(skipped)} 个尚未进入续期窗口（到期前{RENEW_WINDOW_DAYS}天内）的子域名")
+    if not targets:
+        return {"results": skipped}
+
+    # 多个子域名时优先尝试批量续期；缓存中记录为不支持的账号直接逐个续期
+    outcomes = None
+    if len(targets) > 1 and (not use_cache or _cache_get(f"{cache_key}.bulk", BULK_PROBE_TTL) is None):
+        outcomes = bulk_renew(auth_headers, targets, cache_key if use_cache else None)
+
+    if outcomes is None:
+        # 各子域名续期互不依赖，并发发起请求（共享 SESSION 连接池）
+        with ThreadPoolExecutor(max_workers=min(RENEW_CONCURRENCY, len(targets))) as executor:
+            # 每个任务复制一份当前上下文，使工作线程中的日志保留账号前缀
+            futures = [
+                executor.submit(contextvars.copy_context().run, renew_subdomain, auth_headers, sub_id, full_domain)
+                for sub_id, full_domain in targets
+            ]
+            outcomes = [future.result() for future in futures]
+
+    results = [
+        {"domain": full_domain, "result": outcome}
+        for (_, full_domain), outcome in zip(targets, outcomes)
+    ]
+    results.extend(skipped)
+
+    # 续期成功后到期时间已变化，清除缓存避免下次读到旧数据
+    if any(r["result"]["status"] == "success" for r in results):
+        _cache_clear(cache_key)
+    return {"results": results}
+
+def _run_account(idx, total, account, cache_ttl):
+    """在工作线程中处理单个账号，期间的日志均带上该账号编号"""
+    token = _CURRENT_ACCOUNT.set(idx + 1)
+    try:
+        log(f"===== 处理账号 {idx+1}/{total} =====")
+        return process_account(account, cache_ttl)
+    finally:
+        _CURRENT_ACCOUNT.reset(token)
+
+# 摘要表格中各续期状态对应的图标，未列出的状态均视为失败
+_STATUS_ICONS = {"success": "✅", "skipped": "ℹ️"}
+
+def format_account_summary(idx, res):
+    """将单个账号的续期结果格式化为 Markdown 摘要片段"""
+    parts = [f"## 账号 {idx+1}\n\n"]
+    if not res:
+        parts.append("账号配置无效，已跳过\n\n")
+    elif "error" in res:
+        parts.append(f"❌ 处理失败: {res['error']}\n\n")
+    elif "message" in res:
+        parts.append(f"ℹ️ {res['message']}\n\n")
+    else:
+        results = res.get("results", [])
+        if not results:
+            parts.append("无子域名\n\n")
+        else:
+            parts.append("| 域名 | 状态 | 详细信息 |\n|------|------|----------|\n")
+            parts.extend(
+                f"| {r['domain']} | {_STATUS_ICONS.get(r['result']['status'], '❌')} | {r['result']['message']} |\n"
+                for r in results
+            )
+            parts.append("\n")
+    return "".join(parts)
+
+def main():
+    # 仅在作为脚本运行时配置日志输出，导入本模块不会改动根 logger
+    logging.basicConfig(
+        level=logging.INFO,
+        format="[%(asctime)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+        stream=sys.stdout,
+    )
+
+    cache_ttl = _read_cache_ttl()
+
+    accounts_json = os.getenv("ACCOUNTS_JSON")
+    if not accounts_json:
+        log("错误: 环境变量 ACCOUNTS_JSON 未设置")
+        sys.exit(1)
+
+    try:
+        accounts = _loads(accounts_json)
+        if not isinstance(accounts, list):
+            raise ValueError("ACCOUNTS 必须是 JSON 数组")
+    except Exception as e:
+        log(f"解析 ACCOUNTS_JSON 失败: {e}")
+        sys.exit(1)
+
+    # 摘要文件一开始就打开，每个账号处理完立即追加写入，任务中断时也能看到已完成部分
+    summary_file = os.getenv("GITHUB_STEP_SUMMARY")
+    summary = open(summary_file, "a", encoding="utf-8") if summary_file else None
+    if summary is None:
+        log("未找到 GITHUB_STEP_SUMMARY 环境变量，跳过摘要生成")
+
+    try:
+        if summary:
+            summary.write("# DNSHE 免费域名续期结果\n\n")
+            summary.write(f"执行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+            summary.flush()
+
+        # 各账号互相独立，并行处理；按完成顺序写入摘要
+        with ThreadPoolExecutor(max_workers=max(1, min(ACCOUNT_CONCURRENCY, len(accounts)))) as executor:
+            futures = {}
+            for idx, acc in enumerate(accounts):
+                futures[executor.submit(_run_account, idx, len(accounts), acc, cache_ttl)] = idx
+            for future in as_completed(futures):
+                # 单个账号出现未预期的异常时只记为该账号失败，其余账号结果照常写入摘要
+                try:
+                    res = future.result()
+                except Exception as e:
+                    log(f"账号 {futures[future]+1} 处理异常: {e}")
+                    res = {"error": f"处理异常: {e}"}
+                if summary:
+                    summary.write(format_account_summary(futures[future], res))
+                    summary.flush()
+
+        if summary:
+            summary.write("---\n> 自动续期任务执行完毕，更多详情请查看工作流日志。\n")
+    finally:
+        if summary:
+            summary.close()
+
+    SESSION.close()
+    log("所有账号处理完毕")